@@ -2,7 +2,9 @@
 
 
 
+import argparse
 import json
+import os
 import sys
 
 ################################################################################
@@ -81,48 +83,51 @@ class DAGNode(object):
 ## declarations/globals/set-up-once-and-use-multiple ###########################
 ################################################################################
 
-# list to store things that the player can do to transform goals into simpler intermediate goals
-actions = None
-
 # dag of actions which when linearized will be our plan
 nodes = dict()
 dagroot = DAGNode("root", 0)
 
-# set of goals which need to be satisfied. keys are tuples that specify the count and whether the
-# goal is a a consume or a require. (count, "consume"|"require")
-unsat = dict()
+# the subcommands that main() knows about. anything else in the first position is taken to be an
+# actions file, so that the old "oreganizer.py actions goals [resources]" invocation keeps working.
+COMMANDS = ("plan", "lp-plan", "check", "bench")
 
-# things that seem to be terminals - we can't find any actions which would satisfy them
-unsatisfiable = dict()
+# where this file lives; "bench" runs everything from here so it can find us and the examples
+HERE = os.path.dirname(os.path.abspath(__file__))
 
-# set of goals which satisfied previous consumes dependencies and are therefore still around
-resources = dict()
+# modules that are too slow to import on every invocation. these must only ever be imported inside
+# the functions that actually use them; "bench" fails if a cheap command drags them in.
+HEAVY_MODULES = ("cvxopt", "numpy")
 
-# and a thing to track how much stuff goes through our system
-resources_consumed = dict()
+# how long, in milliseconds, a cheap command ("check" on the smeltery example) is allowed to take on
+# top of the bare interpreter before "bench" calls it a regression.
+STARTUP_BUDGET_MS = 50.0
 
 ################################################################################
 ## handle command line args and get input ######################################
 ################################################################################
 
-# a list of actions that we can take.
-actionsfilename = sys.argv[1]
-with open(actionsfilename, "r") as actionfile:
-    actions = json.load(actionfile)
+def load_json(filename):
+    with open(filename, "r") as f:
+        try:
+            return json.load(f)
+        except ValueError as e:
+            # json's own message only says where in the file things went wrong, not which file
+            raise ValueError("{0}: {1}".format(filename, e)) from e
+
+def load_inputs(actionsfilename, goalsfilename, resourcesfilename=None):
+    # a list of actions that we can take.
+    actions = load_json(actionsfilename)
 
-# a list of top-level goals.
-goalsfilename = sys.argv[2]
-with open(goalsfilename, "r") as goalfile:
-    goals = json.load(goalfile)
+    # a list of top-level goals.
+    goals = load_json(goalsfilename)
 
-# a list of things we've already built or gotten done.
-if len(sys.argv) >= 4:
-    resourcesfilename = sys.argv[3]
-    with open(resourcesfilename, "r") as resourcesfile:
-        resources = json.load(resourcesfile)
-else:
-    resources = dict()
+    # a list of things we've already built or gotten done.
+    if resourcesfilename is not None:
+        resources = load_json(resourcesfilename)
+    else:
+        resources = dict()
 
+    return actions, goals, resources
 
 ################################################################################
 ## set up planner data structures ##############################################
@@ -139,155 +144,355 @@ def action_filter(input_actions):
             for g,c in deps["consumes"].items():
                 dependencies[g] = (c, "consume")
         yield (name, dependencies)
-actions = dict(action_filter(actions))
-
-# we start the algorithm off with several unsatisfied requires dependencies, corresponding to the
-# user's top-level goals
-unsat = {name: (count, "require") for (name, count) in goals.items()}
-
-# the only thing we have to do for the resources file is parse the "enough" statements: some things
-# are so easy to make that we'll just assume we have an arbitrarily large number of them. For
-# example, once you have an igneous extruder, you have *enough* cobblestone to do anything you
-# want.
-for name, count in resources.items():
-    if count == "enough":
-        resources[name] = float("inf")
 
 ################################################################################
-## check that our data structures look good ####################################
+## check that our inputs look good #############################################
 ################################################################################
 
-if verbosity >= VERBOSITY.INFO:
-    print("Available actions: ")
-    for name,deps in actions.items():
-        print("  {0} <- {1} using {2}".format(name,
-                                              ["{0} {1}".format(depc, depn)
-                                               for (depn,(depc, dept)) in deps.items()
-                                               if dept == "consume"],
-                                              ["{0} {1}".format(depc, depn)
-                                               for (depn,(depc, dept)) in deps.items()
-                                               if dept == "require"]))
-    print()
+def is_count(value):
+    # bools are ints as far as python is concerned, but "true" is not a sensible count
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0
+
+def check_inputs(actions, goals, resources):
+    problems = []
+
+    if not isinstance(actions, dict):
+        problems.append("actions: expected an object mapping names to actions")
+    else:
+        for name, deps in actions.items():
+            if not isinstance(deps, dict):
+                problems.append("actions: {0}: expected an object".format(name))
+                continue
+            for key, subdeps in deps.items():
+                if key not in ("consumes", "requires"):
+                    problems.append("actions: {0}: unknown key {1!r}".format(name, key))
+                elif not subdeps:
+                    # action_filter skips anything falsy, so null, [] and {} all mean "nothing"
+                    continue
+                elif not isinstance(subdeps, dict):
+                    problems.append("actions: {0}: {1}: expected an object".format(name, key))
+                else:
+                    for dep, count in subdeps.items():
+                        if not is_count(count):
+                            problems.append("actions: {0}: {1}: bad count {2!r} for {3}".format(
+                                name, key, count, dep))
+
+    if not isinstance(goals, dict):
+        problems.append("goals: expected an object mapping names to counts")
+    else:
+        for name, count in goals.items():
+            if not is_count(count):
+                problems.append("goals: bad count {0!r} for {1}".format(count, name))
 
-print("Initial goals:")
-for name,(count, t) in unsat.items():
-    print("  {0}: {1:3}x {2}".format(t, count, name))
-print()
+    if not isinstance(resources, dict):
+        problems.append("resources: expected an object mapping names to counts")
+    else:
+        for name, count in resources.items():
+            if count != "enough" and not is_count(count):
+                problems.append("resources: bad count {0!r} for {1}".format(count, name))
 
-print("Initial resources:")
-for name,count in resources.items():
-    print("  {0:3}x {1}".format(count, name))
-print()
+    return problems
 
 ################################################################################
 ## run the actual planner ######################################################
 ################################################################################
 
-print("Planning...")
-while unsat:
-    (next_name,(next_count,next_type)) = unsat.popitem()
-    if verbosity >= VERBOSITY.VINFO:
-        print("{2}ing {0} x{1}".format(next_name, next_count, next_type[:-1]))
-
-    if next_type == "consume":
-        # track how much we consume total
-        AddGoal(next_name, next_count, "consume", resources_consumed)
-        
-    if next_name in resources:
-        if next_type == "require" and resources[next_name] >= next_count:
-            # we have everything we need, continue happily
-            if verbosity >= VERBOSITY.VINFO:
-                print("  satisfied by existing resources")
-            continue
-        elif next_type == "require" and resources[next_name] < next_count:
-            # we have some, but not enough. reduce our count and move to the next section to add
-            # the remainder
-            if verbosity >= VERBOSITY.VINFO:
-                print("  partially satisfied by existing resources")
-            next_count -= resources[next_name]
-        elif next_type == "consume" and resources[next_name] > next_count:
-            # we have everything we need, but we have to eat some of it
-            if verbosity >= VERBOSITY.VINFO:
-                print("  partially satisfied by existing resources")
-            # print("  consuming {0}x {1}".format(next_count, next_name))
-            # AddGoal(next_name, next_count, "consume", resources_consumed)
-            resources[next_name] -= next_count
-            # otherwise done; no need for more goals
-            continue
-        elif next_type == "consume" and resources[next_name] == next_count:
-            # we're going to consume exactly as much as we have
-            if verbosity >= VERBOSITY.VINFO:
-                print("  satisfied perfectly by existing resources")
-            # print("  consuming {0}x {1}".format(next_count, next_name))
-            # AddGoal(next_name, next_count, "consume", resources_consumed)
-            del resources[next_name]
-            # otherwise done; no need for more goals
-            continue
-        elif next_type == "consume" and resources[next_name] < next_count:
-            # we don't have enough to consume, so we remove that much from our count and add a goal
-            # for the remainder
-            if verbosity >= VERBOSITY.VINFO:
-                print("  satisfied existing resources")
-            # print("  consuming {0}x {1}".format(resources[next_name], next_name))
-            # AddGoal(next_name, resources[next_name], "consume", resources_consumed)
-            next_count -= resources[next_name]
-            del resources[next_name]
-            # move to the next section to add the remainder
-            
-    if next_name not in actions:
-        # we can't satisfy this action, because we don't already have any and we don't know how to
-        # make them. add a goal for it to the "you do this manually" list.
-        AddGoal(next_name, next_count, next_type, unsatisfiable)
+def plan(actions, goals, resources):
+    actions = dict(action_filter(actions))
+
+    # we start the algorithm off with several unsatisfied requires dependencies, corresponding to
+    # the user's top-level goals. keys are tuples that specify the count and whether the goal is a
+    # a consume or a require. (count, "consume"|"require")
+    unsat = {name: (count, "require") for (name, count) in goals.items()}
+
+    # things that seem to be terminals - we can't find any actions which would satisfy them
+    unsatisfiable = dict()
+
+    # set of goals which satisfied previous consumes dependencies and are therefore still around.
+    # we work on a copy so the caller's dict doesn't get eaten.
+    resources = dict(resources)
+
+    # and a thing to track how much stuff goes through our system
+    resources_consumed = dict()
+
+    # the only thing we have to do for the resources file is parse the "enough" statements: some
+    # things are so easy to make that we'll just assume we have an arbitrarily large number of
+    # them. For example, once you have an igneous extruder, you have *enough* cobblestone to do
+    # anything you want.
+    for name, count in resources.items():
+        if count == "enough":
+            resources[name] = float("inf")
+
+    if verbosity >= VERBOSITY.INFO:
+        print("Available actions: ")
+        for name,deps in actions.items():
+            print("  {0} <- {1} using {2}".format(name,
+                                                  ["{0} {1}".format(depc, depn)
+                                                   for (depn,(depc, dept)) in deps.items()
+                                                   if dept == "consume"],
+                                                  ["{0} {1}".format(depc, depn)
+                                                   for (depn,(depc, dept)) in deps.items()
+                                                   if dept == "require"]))
+        print()
+
+    print("Initial goals:")
+    for name,(count, t) in unsat.items():
+        print("  {0}: {1:3}x {2}".format(t, count, name))
+    print()
+
+    print("Initial resources:")
+    for name,count in resources.items():
+        print("  {0:3}x {1}".format(count, name))
+    print()
+
+    print("Planning...")
+    while unsat:
+        (next_name,(next_count,next_type)) = unsat.popitem()
         if verbosity >= VERBOSITY.VINFO:
-            print("  todo: {0}x {1}".format(next_count, next_name))
-        
-    # we need to add more of them and we have an action that will give us more.
-    else:
-        for subgoal_name, (subgoal_count, subgoal_type) in actions[next_name].items():
-            if subgoal_type == "consume":
-                # we need an entire set of the subgoal for every instance
-                total_count = subgoal_count * next_count
-            elif subgoal_type == "require":
-                # we only need the number of resources specified total
-                total_count = subgoal_count
-            AddGoal(subgoal_name, total_count, subgoal_type, unsat)
-            if verbosity >= VERBOSITY.INFO:
-                print("  new goal: {2} {1}x {0}".format(subgoal_name, total_count, subgoal_type))
-    
-    # now, if next_goal was a consume goal, it goes away entirely, but if it was a require goal
-    # it's going to stick around. Put it in the resources set.
-    if next_type == "require":
+            print("{2}ing {0} x{1}".format(next_name, next_count, next_type[:-1]))
+
+        if next_type == "consume":
+            # track how much we consume total
+            AddGoal(next_name, next_count, "consume", resources_consumed)
+
         if next_name in resources:
-            resources[next_name] = max(resources[next_name], next_count)
+            if next_type == "require" and resources[next_name] >= next_count:
+                # we have everything we need, continue happily
+                if verbosity >= VERBOSITY.VINFO:
+                    print("  satisfied by existing resources")
+                continue
+            elif next_type == "require" and resources[next_name] < next_count:
+                # we have some, but not enough. reduce our count and move to the next section to
+                # add the remainder
+                if verbosity >= VERBOSITY.VINFO:
+                    print("  partially satisfied by existing resources")
+                next_count -= resources[next_name]
+            elif next_type == "consume" and resources[next_name] > next_count:
+                # we have everything we need, but we have to eat some of it
+                if verbosity >= VERBOSITY.VINFO:
+                    print("  partially satisfied by existing resources")
+                resources[next_name] -= next_count
+                # otherwise done; no need for more goals
+                continue
+            elif next_type == "consume" and resources[next_name] == next_count:
+                # we're going to consume exactly as much as we have
+                if verbosity >= VERBOSITY.VINFO:
+                    print("  satisfied perfectly by existing resources")
+                del resources[next_name]
+                # otherwise done; no need for more goals
+                continue
+            elif next_type == "consume" and resources[next_name] < next_count:
+                # we don't have enough to consume, so we remove that much from our count and add a
+                # goal for the remainder
+                if verbosity >= VERBOSITY.VINFO:
+                    print("  satisfied existing resources")
+                next_count -= resources[next_name]
+                del resources[next_name]
+                # move to the next section to add the remainder
+
+        if next_name not in actions:
+            # we can't satisfy this action, because we don't already have any and we don't know how
+            # to make them. add a goal for it to the "you do this manually" list.
+            AddGoal(next_name, next_count, next_type, unsatisfiable)
+            if verbosity >= VERBOSITY.VINFO:
+                print("  todo: {0}x {1}".format(next_count, next_name))
+
+        # we need to add more of them and we have an action that will give us more.
         else:
-            resources[next_name] = next_count
-print("done!")
+            for subgoal_name, (subgoal_count, subgoal_type) in actions[next_name].items():
+                if subgoal_type == "consume":
+                    # we need an entire set of the subgoal for every instance
+                    total_count = subgoal_count * next_count
+                elif subgoal_type == "require":
+                    # we only need the number of resources specified total
+                    total_count = subgoal_count
+                AddGoal(subgoal_name, total_count, subgoal_type, unsat)
+                if verbosity >= VERBOSITY.INFO:
+                    print("  new goal: {2} {1}x {0}".format(subgoal_name, total_count, subgoal_type))
+
+        # now, if next_goal was a consume goal, it goes away entirely, but if it was a require goal
+        # it's going to stick around. Put it in the resources set.
+        if next_type == "require":
+            if next_name in resources:
+                resources[next_name] = max(resources[next_name], next_count)
+            else:
+                resources[next_name] = next_count
+    print("done!")
+
+
+    print()
+    print("Remaining unsatisfied goals (should be none):")
+    for name,(count, t) in unsat.items():
+        print("  {0}: {1:3}x {2}".format(t, count, name))
+    print()
 
+    print("Do by hand:")
+    for name,(count, t) in [(n, (c, t)) for (n, (c, t)) in unsatisfiable.items() if t == "require"]:
+        print("  {0}: {1:3}x {2}".format(t, count, name))
+    for name,(count, t) in [(n, (c, t)) for (n, (c, t)) in unsatisfiable.items() if t == "consume"]:
+        print("  {0}: {1:3}x {2}".format(t, count, name))
+    print()
 
-print()
-print("Remaining unsatisfied goals (should be none):")
-for name,(count, t) in unsat.items():
-    print("  {0}: {1:3}x {2}".format(t, count, name))
-print()
+    print("Resources that will be built and used along the way:")
+    for name,(count, _) in resources_consumed.items():
+        print("  {0:3}x {1}".format(count, name))
+    print()
 
-print("Do by hand:")
-for name,(count, t) in [(n, (c, t)) for (n, (c, t)) in unsatisfiable.items() if t == "require"]:
-    print("  {0}: {1:3}x {2}".format(t, count, name))
-for name,(count, t) in [(n, (c, t)) for (n, (c, t)) in unsatisfiable.items() if t == "consume"]:
-    print("  {0}: {1:3}x {2}".format(t, count, name))
-print()
+    print("Resources remaining at end:")
+    for name,count in resources.items():
+        print("  {0:3}x {1}".format(count, name))
+    print()
 
-print("Resources that will be built and used along the way:")
-for name,(count, _) in resources_consumed.items():
-    print("  {0:3}x {1}".format(count, name))
-print()
+################################################################################
+## startup benchmark ###########################################################
+################################################################################
 
-print("Resources remaining at end:")
-for name,count in resources.items():
-    print("  {0:3}x {1}".format(count, name))
-print()
+def time_python(args, runs):
+    # best-of-n wall clock time, in milliseconds, for a fresh interpreter to run with args from the
+    # directory this file lives in. we take the minimum because everything else is noise.
+    import subprocess
+    import time
+
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=HERE, check=True,
+                       stdout=subprocess.DEVNULL)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+def heavy_modules_after(args):
+    # run the same command once more, this time as __main__ under runpy, so that we can look at
+    # sys.modules once it's finished and see what it dragged in along the way.
+    import subprocess
+
+    code = ("import runpy, sys\n"
+            "sys.argv = {0!r}\n"
+            "try:\n"
+            "    runpy.run_path(sys.argv[0], run_name='__main__')\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "sys.stderr.write(' '.join(m for m in {1!r} if m in sys.modules))\n").format(
+                args, HEAVY_MODULES)
+    return subprocess.run([sys.executable, "-c", code], cwd=HERE, check=True,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          universal_newlines=True).stderr.split()
+
+def bench(runs, budget):
+    import subprocess
+
+    example = os.path.join(HERE, "examples", "smeltery")
+    command = [os.path.join(HERE, "oreganizer.py"), "check",
+               os.path.join(example, "actions.ore"),
+               os.path.join(example, "goals.ore"),
+               os.path.join(example, "resources.ore")]
+
+    try:
+        bare = time_python(["-c", "pass"], runs)
+        loaded = time_python(command, runs)
+        heavy = heavy_modules_after(command)
+    except (subprocess.CalledProcessError, OSError) as e:
+        print("FAIL: {0}".format(e))
+        return False
+    cost = loaded - bare
+
+    print("bare interpreter:   {0:7.1f} ms".format(bare))
+    print("check command:      {0:7.1f} ms".format(loaded))
+    print("startup cost:       {0:7.1f} ms (budget {1:.1f} ms)".format(cost, budget))
+
+    ok = True
+    if heavy:
+        print("FAIL: check pulled in {0}".format(", ".join(heavy)))
+        ok = False
+    if cost > budget:
+        print("FAIL: startup cost is over budget")
+        ok = False
+    if ok:
+        print("ok")
+    return ok
 
+################################################################################
+## entry point #################################################################
+################################################################################
 
+def positive_int(value):
+    count = int(value)
+    if count < 1:
+        raise argparse.ArgumentTypeError("must be at least 1, got {0}".format(count))
+    return count
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="oreganizer.py",
+        description="Figure out what you need to build, and what you'll have to do by hand.")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="print more about what's going on; repeat for more")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    subparsers.required = True
+
+    def add_task_files(subparser):
+        subparser.add_argument("actions", help="file of things that we know how to make")
+        subparser.add_argument("goals", help="file of things that we want to end up with")
+        subparser.add_argument("resources", nargs="?",
+                               help="file of things that we've already got")
+
+    add_task_files(subparsers.add_parser(
+        "plan", help="work out what to build and what to do by hand"))
+    subparsers.add_parser(
+        "lp-plan", help="run the linear programming planner (needs cvxopt)")
+    add_task_files(subparsers.add_parser(
+        "check", help="make sure task files are well-formed without planning anything"))
+    bench_parser = subparsers.add_parser(
+        "bench", help="measure startup time and fail if it has regressed")
+    bench_parser.add_argument("--runs", type=positive_int, default=10,
+                              help="how many times to start python (default: %(default)s)")
+    bench_parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_MS,
+                              help="allowed startup cost in milliseconds (default: %(default)s)")
+
+    # the old way of running us was just "oreganizer.py [-v] actions goals [resources]". the only
+    # global options are flags, so the first non-option argument is where the command should be.
+    for i, arg in enumerate(argv):
+        if not arg.startswith("-"):
+            if arg not in COMMANDS:
+                argv = argv[:i] + ["plan"] + argv[i:]
+            break
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    global verbosity
+
+    if argv is None:
+        argv = sys.argv[1:]
+    args = parse_args(argv)
+    verbosity = args.verbose
+
+    if args.command == "plan":
+        plan(*load_inputs(args.actions, args.goals, args.resources))
+        return 0
+
+    if args.command == "check":
+        try:
+            problems = check_inputs(*load_inputs(args.actions, args.goals, args.resources))
+        except (OSError, ValueError) as e:
+            problems = [str(e)]
+        for problem in problems:
+            print(problem)
+        if problems:
+            return 1
+        print("ok")
+        return 0
+
+    if args.command == "lp-plan":
+        # only now do we go anywhere near the LP stack
+        import oreganizer_lp
+        return oreganizer_lp.main()
+
+    if args.command == "bench":
+        return 0 if bench(args.runs, args.budget) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
 
 
 